@@ -5,26 +5,66 @@ import numpy as np
 import tensorflow as tf
 from sklearn.metrics.pairwise import cosine_similarity
 import os
+import atexit
+import threading
+from embedding_store import QuantizedEmbeddingStore, top_k_indices
+from sharded_store import ShardRouter, validate_top_k
+from precompute_recommendations import PrecomputedRecommendations, precompute_top_k, model_fingerprint
+from ingestion import load_ratings
+from cooccurrence import CooccurrenceRecommender
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
 class CourseRecommenderAPI:
-    def __init__(self, courses_file="courses.csv"):
+    def __init__(self, courses_file="courses.csv", embedding_precision="float32", num_shards=0,
+                 precomputed_path=None, precomputed_top_k=50, precompute_workers=None,
+                 interactions_source=None, engine="embedding", seed=42):
+        if engine not in ("embedding", "cooccurrence"):
+            raise ValueError(f"Unknown recommender engine {engine!r}")
+        self.engine = engine
+        self.interactions_source = interactions_source
+        self.embedding_precision = embedding_precision
+        self.num_shards = num_shards
+        self.router = None
+        self.precomputed_path = precomputed_path
+        self.precomputed_top_k = precomputed_top_k
+        self.precompute_workers = precompute_workers
+        self.precomputed = None
+        self.seed = seed
         print("Loading course data...")
         self.courses = pd.read_csv(courses_file)
         self.courses['course_id'] = self.courses['course_id'].astype(str)
+        self.courses_by_id = self.courses.drop_duplicates('course_id').set_index('course_id', drop=False)
         print(f"Loaded {len(self.courses)} courses")
         
         self.initialize_system()
     
     def initialize_system(self):
         print("Initializing recommendation system...")
-        self.create_user_interactions()
+        if self.interactions_source:
+            self.load_user_interactions()
+        else:
+            self.create_user_interactions()
+        if self.engine == "cooccurrence":
+            self.build_cooccurrence()
+            print("Recommendation system initialized!")
+            return
         self.build_and_train_model()
         self.generate_embeddings()
+        if self.precomputed_path:
+            self.load_precomputed()
+        if self.num_shards > 0:
+            self.start_shards()
         print("Recommendation system initialized!")
     
+    def load_user_interactions(self):
+        print(f"Loading user interactions from {self.interactions_source}...")
+        self.ratings = load_ratings(self.interactions_source, self.courses)
+        print(f"Loaded {len(self.ratings)} user-course interactions")
+        self.unique_user_ids = self.ratings['user_id'].unique()
+        self.unique_course_ids = self.courses['course_id'].unique()
+    
     def create_user_interactions(self):
         num_users = 1000
         print(f"Simulating {num_users} users and their course interactions...")
@@ -61,10 +101,13 @@ class CourseRecommenderAPI:
         self.unique_user_ids = self.ratings['user_id'].unique()
         self.unique_course_ids = self.courses['course_id'].unique()
     
-    def build_and_train_model(self):
+    def build_and_train_model(self, embedding_dimension=32, epochs=5, learning_rate=0.001, batch_size=256):
         print("Building and training the recommendation model...")
+        if self.precomputed_path:
+            # Identical weights on every restart keep the precomputed table's fingerprint valid
+            tf.keras.utils.set_random_seed(self.seed)
+            tf.config.experimental.enable_op_determinism()
         
-        embedding_dimension = 32
         self.user_ids_vocabulary = tf.keras.layers.StringLookup(mask_token=None)
         self.user_ids_vocabulary.adapt(tf.data.Dataset.from_tensor_slices(self.unique_user_ids))
         self.course_ids_vocabulary = tf.keras.layers.StringLookup(mask_token=None)
@@ -100,10 +143,10 @@ class CourseRecommenderAPI:
         self.model = RecommenderModel(self.user_model, self.course_model)
         self.model.compile(
             loss=tf.keras.losses.MeanSquaredError(),
-            optimizer=tf.keras.optimizers.Adam(learning_rate=0.001)
+            optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate)
         )
         
-        def make_dataset(ratings_data, batch_size=256, shuffle=True):
+        def make_dataset(ratings_data, batch_size=batch_size, shuffle=True):
             user_ids_tensor = tf.convert_to_tensor(ratings_data['user_id'].values)
             course_ids_tensor = tf.convert_to_tensor(ratings_data['course_id'].values)
             ratings_tensor = tf.convert_to_tensor(ratings_data['rating'].values, dtype=tf.float32)
@@ -118,46 +161,143 @@ class CourseRecommenderAPI:
             return dataset
         
         train_dataset = make_dataset(self.ratings)
-        self.model.fit(train_dataset, epochs=5, verbose=0)
+        self.model.fit(train_dataset, epochs=epochs, verbose=0)
         print("Model training complete")
     
     def generate_embeddings(self):
-        print("Generating embeddings...")
+        print(f"Generating {self.embedding_precision} embeddings...")
         
-        self.user_embeddings = {}
-        for user_id in self.unique_user_ids:
-            user_embedding = self.user_model(tf.constant([user_id])).numpy()[0]
-            self.user_embeddings[user_id] = user_embedding
+        user_ids = list(self.unique_user_ids)
+        user_matrix = self.user_model(tf.constant(user_ids)).numpy()
+        self.user_store = QuantizedEmbeddingStore(user_ids, user_matrix, precision=self.embedding_precision)
         
-        self.course_embeddings = {}
-        for course_id in self.unique_course_ids:
-            if course_id in self.ratings['course_id'].values:
-                course_embedding = self.course_model(tf.constant([course_id])).numpy()[0]
-                self.course_embeddings[course_id] = course_embedding
+        rated_course_ids = set(self.ratings['course_id'].values)
+        course_ids = [course_id for course_id in self.unique_course_ids if course_id in rated_course_ids]
+        course_matrix = self.course_model(tf.constant(course_ids)).numpy()
+        self.course_store = QuantizedEmbeddingStore(course_ids, course_matrix, precision=self.embedding_precision)
         
-        print(f"Generated embeddings for {len(self.user_embeddings)} users and {len(self.course_embeddings)} courses")
+        print(f"Generated embeddings for {len(self.user_store)} users and {len(self.course_store)} courses "
+              f"({(self.user_store.nbytes + self.course_store.nbytes) / 1024:.1f} KiB)")
     
-    def recommend_courses_to_user(self, user_id, top_k=5):
-        if user_id not in self.user_embeddings:
-            print(f"User {user_id} not found in embeddings")
-            return pd.DataFrame()
+    def build_cooccurrence(self):
+        print("Building course co-occurrence counts...")
+        self.cooccurrence = CooccurrenceRecommender.from_ratings(self.ratings)
+        # A list, so a live user is appended without copying every known id
+        self.unique_user_ids = list(self.unique_user_ids)
+        self.users_lock = threading.Lock()
+        print(f"Co-occurrence engine ready with {len(self.cooccurrence.item_counts)} courses")
+    
+    def add_interaction(self, user_id, course_id):
+        """Feed a new interaction to the co-occurrence engine; it is visible to the next query."""
+        if self.engine != "cooccurrence":
+            raise ValueError("Live interactions are only supported by the cooccurrence engine")
+        if not isinstance(user_id, str) or not isinstance(course_id, str):
+            raise ValueError("userId and courseId must be strings")
+        if course_id not in self.courses_by_id.index:
+            raise KeyError(course_id)
+        with self.users_lock:
+            if user_id not in self.cooccurrence.user_items:
+                self.unique_user_ids.append(user_id)
+            return self.cooccurrence.add_interaction(user_id, course_id)
+    
+    def load_precomputed(self):
+        fingerprint = model_fingerprint(self.user_store, self.course_store)
+        if PrecomputedRecommendations.exists(self.precomputed_path):
+            table = PrecomputedRecommendations(self.precomputed_path)
+            # precompute_top_k caps top_k at the catalog size
+            if table.fingerprint == fingerprint and table.top_k >= min(self.precomputed_top_k, len(self.course_store)):
+                self.precomputed = table
+                print(f"Loaded precomputed recommendations for {len(table)} users")
+                return
+            print("Precomputed recommendations are stale, rebuilding...")
         
-        user_embedding = self.user_embeddings[user_id]
-        similarities = []
+        print(f"Precomputing top-{self.precomputed_top_k} recommendations for {len(self.user_store)} users...")
+        precompute_top_k(self.user_store, self.course_store, self.precomputed_path,
+                         top_k=self.precomputed_top_k, workers=self.precompute_workers)
+        self.precomputed = PrecomputedRecommendations(self.precomputed_path)
+        print("Precomputed recommendations ready")
+    
+    def start_shards(self):
+        print(f"Partitioning user embeddings across {self.num_shards} shard processes...")
+        self.router = ShardRouter.launch(self.user_store, self.course_store, self.num_shards)
+        atexit.register(self.router.close)
+        # The shards own the user vectors from here on
+        self.user_store = None
+        print(f"Started {self.num_shards} shards")
+    
+    def top_course_ids_for_users(self, user_ids, top_k=5):
+        """Return {user_id: [course_id, ...]} best first, or None for unknown users."""
+        results = {user_id: None for user_id in user_ids}
+        if self.engine == "cooccurrence":
+            for user_id in user_ids:
+                recommended = self.cooccurrence.recommend_for_user(user_id, top_k)
+                results[user_id] = [course_id for course_id, _ in recommended] if recommended else None
+            return results
         
-        for course_id, course_embedding in self.course_embeddings.items():
-            similarity = np.dot(user_embedding, course_embedding)
-            similarities.append((course_id, similarity))
+        if self.precomputed is not None:
+            for user_id in user_ids:
+                results[user_id] = self.precomputed.lookup(user_id, top_k)
+            user_ids = [user_id for user_id, course_ids in results.items() if course_ids is None]
+            if not user_ids:
+                return results
         
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        top_course_ids = [sim[0] for sim in similarities[:top_k]]
+        if self.router is not None:
+            for user_id, result in self.router.recommend_batch(user_ids, top_k).items():
+                results[user_id] = result[0] if result is not None else None
+            return results
         
-        return self.courses[self.courses['course_id'].isin(top_course_ids)][
+        known = [user_id for user_id in user_ids if user_id in self.user_store]
+        if known:
+            scores = self.course_store.batch_scores(self.user_store.vectors(known))
+            top = top_k_indices(scores, top_k)
+            for row, user_id in enumerate(known):
+                results[user_id] = self.course_store.ids[top[row]].tolist()
+        return results
+    
+    def course_rows(self, course_ids):
+        """Catalog rows for ``course_ids``, in the order given (best first)."""
+        course_ids = [course_id for course_id in course_ids if course_id in self.courses_by_id.index]
+        return self.courses_by_id.loc[course_ids][
             ['course_id', 'course_title', 'subject', 'level', 'price', 'num_subscribers', 'num_reviews', 'num_lectures', 'content_duration']
-        ]
+        ].reset_index(drop=True)
+    
+    def recommend_courses_to_user(self, user_id, top_k=5):
+        top_course_ids = self.top_course_ids_for_users([user_id], top_k)[user_id]
+        if top_course_ids is None:
+            print(f"User {user_id} not found in embeddings")
+            return pd.DataFrame()
+        
+        return self.course_rows(top_course_ids)
+    
+    def find_similar_courses(self, course_id, top_k=5):
+        if self.engine == "cooccurrence":
+            similar_ids = [other_id for other_id, _ in self.cooccurrence.similar_courses(course_id, top_k)]
+        elif course_id in self.course_store:
+            similar_ids, _ = self.course_store.top_k(self.course_store.vector(course_id), top_k, exclude=course_id)
+        else:
+            similar_ids = []
+        return self.course_rows(similar_ids)
+    
+    def recommend_courses_to_users(self, user_ids, top_k=5):
+        """Batch version of recommend_courses_to_user, keyed by user id."""
+        top_course_ids = self.top_course_ids_for_users(user_ids, top_k)
+        return {
+            user_id: (self.course_rows(course_ids) if course_ids is not None else pd.DataFrame())
+            for user_id, course_ids in top_course_ids.items()
+        }
 
-# Initialize the recommender system
-recommender = CourseRecommenderAPI()
+# Initialize the recommender system. Spawned shard and precompute processes re-import
+# this module as __mp_main__ and must not build (and train) a recommender of their own.
+if __name__ != '__mp_main__':
+    recommender = CourseRecommenderAPI(
+        embedding_precision=os.environ.get('EMBEDDING_PRECISION', 'float32'),
+        num_shards=int(os.environ.get('NUM_SHARDS', '0')),
+        precomputed_path=os.environ.get('PRECOMPUTED_RECOMMENDATIONS'),
+        precomputed_top_k=int(os.environ.get('PRECOMPUTED_TOP_K', '50')),
+        precompute_workers=int(os.environ['PRECOMPUTE_WORKERS']) if os.environ.get('PRECOMPUTE_WORKERS') else None,
+        interactions_source=os.environ.get('INTERACTIONS_SOURCE'),
+        engine=os.environ.get('RECOMMENDER_ENGINE', 'embedding')
+    )
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -168,7 +308,10 @@ def get_recommendations():
     try:
         data = request.get_json()
         user_id = data.get('userId', 'user_0')
-        top_k = data.get('topK', 10)
+        try:
+            top_k = validate_top_k(data.get('topK', 10))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         recommendations = recommender.recommend_courses_to_user(user_id, top_k)
         
@@ -190,6 +333,30 @@ def get_recommendations():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/recommend/batch', methods=['POST'])
+def get_batch_recommendations():
+    try:
+        data = request.get_json()
+        user_ids = data.get('userIds', [])
+        if not isinstance(user_ids, list) or not all(isinstance(user_id, str) for user_id in user_ids):
+            return jsonify({"error": "userIds must be a list of strings"}), 400
+        try:
+            top_k = validate_top_k(data.get('topK', 10))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        recommendations = recommender.recommend_courses_to_users(user_ids, top_k)
+        
+        return jsonify({
+            "recommendations": {
+                user_id: courses.to_dict('records') for user_id, courses in recommendations.items()
+            },
+            "topK": top_k
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/courses', methods=['GET'])
 def get_courses():
     try:
@@ -210,6 +377,39 @@ def get_course(course_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/courses/<course_id>/similar', methods=['GET'])
+def get_similar_courses(course_id):
+    try:
+        try:
+            top_k = validate_top_k(int(request.args.get('topK', 5)))
+        except ValueError:
+            return jsonify({"error": f"topK must be a positive integer, got {request.args.get('topK')!r}"}), 400
+        similar_courses = recommender.find_similar_courses(course_id, top_k)
+        return jsonify({
+            "courseId": course_id,
+            "similar": similar_courses.to_dict('records')
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/interactions', methods=['POST'])
+def post_interaction():
+    try:
+        data = request.get_json()
+        user_id = data.get('userId')
+        course_id = data.get('courseId')
+        if not user_id or not course_id:
+            return jsonify({"error": "userId and courseId are required"}), 400
+        
+        added = recommender.add_interaction(user_id, course_id)
+        return jsonify({"added": added, "userId": user_id, "courseId": course_id})
+    except KeyError:
+        return jsonify({"error": "Course not found"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/users', methods=['GET'])
 def get_users():
     try:
@@ -224,7 +424,11 @@ if __name__ == '__main__':
     print("Available endpoints:")
     print("  GET  /health - Health check")
     print("  POST /recommend - Get recommendations for a user")
+    print("  POST /recommend/batch - Get recommendations for several users")
     print("  GET  /courses - Get all courses")
     print("  GET  /courses/<id> - Get specific course")
+    print("  GET  /courses/<id>/similar - Get similar courses")
+    print("  POST /interactions - Record a user-course interaction (cooccurrence engine)")
     print("  GET  /users - Get all users")
-    app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
+    # The reloader would start a second copy of every shard process
+    app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=recommender.router is None) 
\ No newline at end of file
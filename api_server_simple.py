@@ -3,12 +3,14 @@ from flask_cors import CORS
 import pandas as pd
 import numpy as np
 import os
+from ingestion import load_ratings
 
 app = Flask(__name__)
 CORS(app)
 
 class SimpleCourseRecommenderAPI:
-    def __init__(self, courses_file="courses.csv"):
+    def __init__(self, courses_file="courses.csv", interactions_source=None):
+        self.interactions_source = interactions_source
         print("Loading course data...")
         self.courses = pd.read_csv(courses_file)
         self.courses['course_id'] = self.courses['course_id'].astype(str)
@@ -18,9 +20,19 @@ class SimpleCourseRecommenderAPI:
     
     def initialize_system(self):
         print("Initializing simple recommendation system...")
-        self.create_user_interactions()
+        if self.interactions_source:
+            self.load_user_interactions()
+        else:
+            self.create_user_interactions()
         print("Simple recommendation system initialized!")
     
+    def load_user_interactions(self):
+        print(f"Loading user interactions from {self.interactions_source}...")
+        self.ratings = load_ratings(self.interactions_source, self.courses)
+        print(f"Loaded {len(self.ratings)} user-course interactions")
+        self.unique_user_ids = self.ratings['user_id'].unique()
+        self.unique_course_ids = self.courses['course_id'].unique()
+    
     def create_user_interactions(self):
         num_users = 1000
         print(f"Simulating {num_users} users and their course interactions...")
@@ -95,7 +107,7 @@ class SimpleCourseRecommenderAPI:
         ]
 
 
-recommender = SimpleCourseRecommenderAPI()
+recommender = SimpleCourseRecommenderAPI(interactions_source=os.environ.get('INTERACTIONS_SOURCE'))
 
 @app.route('/health', methods=['GET'])
 def health_check():
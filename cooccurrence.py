@@ -0,0 +1,204 @@
+import math
+import time
+import heapq
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+
+from embedding_store import QuantizedEmbeddingStore
+
+METRICS = ('cosine', 'jaccard')
+
+
+def _check_top_k(top_k):
+    # A negative top_k would slice from the end of a cached row instead of failing
+    if top_k <= 0:
+        raise ValueError(f"top_k must be positive, got {top_k}")
+
+
+class CooccurrenceRecommender:
+    """Training-free item-to-item recommender over course co-occurrence counts.
+
+    Two courses co-occur once for every user who interacted with both.
+    Counts live in a sparse ``{course: {other: count}}`` map, so recording an
+    interaction only touches the rows of the courses that user already has.
+    Similarity is normalised on read:
+
+    - cosine: ``co(a, b) / sqrt(n(a) * n(b))``
+    - jaccard: ``co(a, b) / (n(a) + n(b) - co(a, b))``
+
+    where ``n(x)`` is the number of users who interacted with ``x``. Each
+    row's top-N list is computed on first use and cached together with the
+    ``n(other)`` of every entry. An update dirties the new course and the
+    user's other courses, whose co-counts changed. A neighbour whose score
+    only moved because another course got more popular is caught on read,
+    when a cached ``n(other)`` no longer matches. Since counts only grow,
+    a course outside the cached top-N can never overtake one inside it
+    without such a mismatch, so cached rows are always exact.
+    """
+
+    def __init__(self, metric='cosine', top_n=50):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}, expected one of {METRICS}")
+        self.metric = metric
+        self.top_n = top_n
+        self.user_items = {}
+        self.item_counts = {}
+        self.co_counts = {}
+        self._top = {}
+        self._dirty = set()
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_ratings(cls, ratings, metric='cosine', top_n=50):
+        engine = cls(metric=metric, top_n=top_n)
+        for user_id, course_id in zip(ratings['user_id'].values, ratings['course_id'].values):
+            engine.add_interaction(user_id, course_id)
+        return engine
+
+    def __contains__(self, course_id):
+        return course_id in self.item_counts
+
+    def add_interaction(self, user_id, course_id):
+        """Record that ``user_id`` interacted with ``course_id``.
+
+        Returns False if the pair was already known. Cost is O(number of
+        courses the user already has).
+        """
+        with self._lock:
+            items = self.user_items.setdefault(user_id, set())
+            if course_id in items:
+                return False
+
+            row = self.co_counts.setdefault(course_id, {})
+            for other in items:
+                row[other] = row.get(other, 0) + 1
+                other_row = self.co_counts[other]
+                other_row[course_id] = other_row.get(course_id, 0) + 1
+                self._dirty.add(other)
+
+            items.add(course_id)
+            self.item_counts[course_id] = self.item_counts.get(course_id, 0) + 1
+            self._dirty.add(course_id)
+            return True
+
+    def similarity(self, course_id, other_id):
+        co = self.co_counts.get(course_id, {}).get(other_id, 0)
+        if co == 0:
+            return 0.0
+        return self._score(co, self.item_counts[course_id], self.item_counts[other_id])
+
+    def _score(self, co, count, other_count):
+        if self.metric == 'cosine':
+            return co / math.sqrt(count * other_count)
+        return co / (count + other_count - co)
+
+    def _compute_row(self, course_id, n):
+        count = self.item_counts[course_id]
+        scores = ((other, self._score(co, count, self.item_counts[other]))
+                  for other, co in self.co_counts[course_id].items())
+        return heapq.nlargest(n, scores, key=lambda pair: pair[1])
+
+    def similar_courses(self, course_id, top_k=5):
+        """Return up to top_k ``(course_id, score)`` pairs, most similar first."""
+        _check_top_k(top_k)
+        with self._lock:
+            if course_id not in self.item_counts:
+                return []
+            if top_k > self.top_n:
+                return self._compute_row(course_id, top_k)
+            cached = self._top.get(course_id)
+            if (course_id in self._dirty or cached is None
+                    or any(self.item_counts[other] != count for (other, _), count in zip(*cached))):
+                row = self._compute_row(course_id, self.top_n)
+                cached = self._top[course_id] = (row, [self.item_counts[other] for other, _ in row])
+                self._dirty.discard(course_id)
+            return cached[0][:top_k]
+
+    def recommend_for_user(self, user_id, top_k=5):
+        """Score unseen courses by summed similarity to the user's courses."""
+        _check_top_k(top_k)
+        with self._lock:
+            items = self.user_items.get(user_id)
+            if not items:
+                return []
+            totals = {}
+            for course_id in items:
+                for other, score in self.similar_courses(course_id, self.top_n):
+                    if other not in items:
+                        totals[other] = totals.get(other, 0.0) + score
+            return heapq.nlargest(top_k, totals.items(), key=lambda pair: pair[1])
+
+
+def _simulate_interactions(courses, num_users, seed=42):
+    """Fast stand-in for create_user_interactions: 1-2 subjects, 3 courses each."""
+    rng = np.random.default_rng(seed)
+    by_subject = {subject: group['course_id'].to_numpy() for subject, group in courses.groupby('subject')}
+    subjects = list(by_subject)
+    user_ids, course_ids = [], []
+    for user in range(num_users):
+        for subject in rng.choice(subjects, size=rng.integers(1, 3), replace=False):
+            picked = rng.choice(by_subject[subject], size=min(3, len(by_subject[subject])), replace=False)
+            user_ids.extend([f"user_{user}"] * len(picked))
+            course_ids.extend(picked)
+    return pd.DataFrame({'user_id': user_ids, 'course_id': course_ids})
+
+
+def _latency(fn, args_list):
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e6
+    return f"p50 {np.percentile(timings, 50):8.1f}us  p95 {np.percentile(timings, 95):8.1f}us"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the co-occurrence engine against the embedding path")
+    parser.add_argument('--courses-file', default='courses.csv')
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--updates', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--metric', default='cosine', choices=METRICS)
+    parser.add_argument('--top-k', type=int, default=10)
+    args = parser.parse_args()
+
+    courses = pd.read_csv(args.courses_file)
+    courses['course_id'] = courses['course_id'].astype(str)
+    ratings = _simulate_interactions(courses, args.users)
+    updates = _simulate_interactions(courses, args.updates // 4 + 1, seed=7)
+    updates['user_id'] = updates['user_id'].str.replace('user_', 'new_user_')
+    updates = updates.head(args.updates)
+
+    start = time.perf_counter()
+    engine = CooccurrenceRecommender.from_ratings(ratings, metric=args.metric)
+    build_seconds = time.perf_counter() - start
+    print(f"Built co-occurrence counts from {len(ratings)} interactions in {build_seconds:.2f}s")
+
+    start = time.perf_counter()
+    for user_id, course_id in zip(updates['user_id'].values, updates['course_id'].values):
+        engine.add_interaction(user_id, course_id)
+    update_seconds = time.perf_counter() - start
+    print(f"Update throughput: {len(updates) / update_seconds:,.0f} interactions/s")
+
+    rng = np.random.default_rng(0)
+    known_courses = list(engine.item_counts)
+    query_courses = [(c, args.top_k) for c in rng.choice(known_courses, size=args.queries)]
+    query_users = [(u, args.top_k) for u in rng.choice(ratings['user_id'].unique(), size=args.queries)]
+
+    engine._top.clear()
+    print(f"co-occurrence similar (cold)  {_latency(engine.similar_courses, query_courses)}")
+    print(f"co-occurrence similar (warm)  {_latency(engine.similar_courses, query_courses)}")
+    print(f"co-occurrence recommend       {_latency(engine.recommend_for_user, query_users)}")
+
+    # Latency of the embedding path does not depend on the learned values,
+    # so random 32-d vectors of the same shape stand in for a trained model
+    user_store = QuantizedEmbeddingStore(ratings['user_id'].unique(),
+                                         rng.normal(size=(ratings['user_id'].nunique(), 32)))
+    course_store = QuantizedEmbeddingStore(known_courses, rng.normal(size=(len(known_courses), 32)))
+    print(f"embedding similar             "
+          f"{_latency(lambda c, k: course_store.top_k(course_store.vector(c), k, exclude=c), query_courses)}")
+    print(f"embedding recommend           "
+          f"{_latency(lambda u, k: course_store.top_k(user_store.vector(u), k), query_users)}")
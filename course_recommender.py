@@ -3,43 +3,135 @@ import numpy as np
 import tensorflow as tf
 import os
 import time
+import shutil
+import threading
 from sklearn.metrics.pairwise import cosine_similarity
 from colorama import Fore, Style, init
+from ingestion import load_ratings
+from cooccurrence import CooccurrenceRecommender
 
 init(autoreset=True)
 
 class CourseRecommender:
-    def __init__(self, courses_file="courses.csv"):
-        self.print_header("Course Recommender System")
-        print(f"{Fore.CYAN}Loading course data from {courses_file}...{Style.RESET_ALL}")
-        
-        self.courses = pd.read_csv(courses_file)
-        self.courses['course_id'] = self.courses['course_id'].astype(str)
-        
-        print(f"{Fore.GREEN}✓ Loaded {len(self.courses)} courses{Style.RESET_ALL}")
-        
-        self.initialize_system()
+    def __init__(self, courses_file="courses.csv", interactions_source=None, engine="embedding",
+                 courses=None, initialize="background"):
+        """Load the catalog and set up the recommender.
+        
+        ``initialize`` is "background" for the interactive CLI (train on a
+        thread while the menu is usable), "now" to train before returning,
+        or "skip" for callers that drive the individual steps themselves.
+        ``courses`` can be passed instead of ``courses_file`` to reuse an
+        already loaded catalog.
+        """
+        if engine not in ("embedding", "cooccurrence"):
+            raise ValueError(f"Unknown recommender engine {engine!r}")
+        if initialize not in ("background", "now", "skip"):
+            raise ValueError(f"Unknown initialize mode {initialize!r}")
+        self.interactions_source = interactions_source
+        self.engine = engine
+        # Callers that skip initialization drive the steps themselves and print their own output
+        self.quiet = initialize == "skip"
+        self.status = ""
+        self.model_ready = threading.Event()
+        self.model_error = None
+        self.ratings = None
+        self.unique_user_ids = None
+        self.terminal_width = shutil.get_terminal_size().columns
+        
+        if courses is None:
+            if initialize != "skip":
+                self.print_header("Course Recommender System")
+            self.log(f"{Fore.CYAN}Loading course data from {courses_file}...{Style.RESET_ALL}")
+            courses = pd.read_csv(courses_file)
+            courses['course_id'] = courses['course_id'].astype(str)
+        self.courses = courses
+        self.prepare_catalog_views()
+        
+        self.log(f"{Fore.GREEN}✓ Loaded {len(self.courses)} courses{Style.RESET_ALL}")
+        
+        if initialize == "background":
+            self.start_background_initialization()
+        elif initialize == "now":
+            self.initialize_system()
+            self.model_ready.set()
     
     def print_header(self, text):
-        terminal_width = os.get_terminal_size().columns
-        print("\n" + "=" * terminal_width)
-        print(f"{Fore.YELLOW}{text.center(terminal_width)}{Style.RESET_ALL}")
-        print("=" * terminal_width + "\n")
+        print("\n" + "=" * self.terminal_width)
+        print(f"{Fore.YELLOW}{text.center(self.terminal_width)}{Style.RESET_ALL}")
+        print("=" * self.terminal_width + "\n")
+    
+    def log(self, message):
+        if self.quiet:
+            self.status = message
+        else:
+            print(message)
+    
+    def prepare_catalog_views(self):
+        """Precompute the sorted views used by browsing, paging and detail pages."""
+        self.sorted_courses = self.courses.sort_values('num_subscribers', ascending=False)
+        self.subjects = sorted(self.courses['subject'].unique())
+        self.courses_by_subject = {
+            subject: group for subject, group in self.sorted_courses.groupby('subject', sort=False)
+        }
+        self.courses_by_id = self.courses.drop_duplicates('course_id').set_index('course_id', drop=False)
+    
+    def start_background_initialization(self):
+        """Train the model on a background thread so the menu is usable right away."""
+        # Progress goes to the menu's status line instead of being printed over it
+        self.quiet = True
+        self.status = "Training recommendation model in the background..."
+        self.training_thread = threading.Thread(target=self.initialize_in_background, daemon=True)
+        self.training_thread.start()
+    
+    def initialize_in_background(self):
+        try:
+            self.initialize_system()
+        except Exception as e:
+            self.model_error = e
+            self.status = f"Model training failed ({e}); using popularity-based recommendations"
+        else:
+            self.model_ready.set()
+    
+    def is_model_ready(self):
+        return self.model_ready.is_set()
     
     def initialize_system(self):
-        print(f"{Fore.CYAN}Initializing recommendation system...{Style.RESET_ALL}")
+        self.log(f"{Fore.CYAN}Initializing recommendation system...{Style.RESET_ALL}")
         
-        self.create_user_interactions()
-        
-        self.build_and_train_model()
+        if self.interactions_source:
+            self.load_user_interactions()
+        else:
+            self.create_user_interactions()
         
-        self.generate_embeddings()
+        if self.engine == "cooccurrence":
+            self.build_cooccurrence()
+        else:
+            self.build_and_train_model()
+            
+            self.generate_embeddings()
         
-        print(f"{Fore.GREEN}✓ Recommendation system initialized and ready!{Style.RESET_ALL}\n")
+        self.log(f"{Fore.GREEN}✓ Recommendation system initialized and ready!{Style.RESET_ALL}")
+    
+    def build_cooccurrence(self):
+        """Build the training-free co-occurrence engine from the interactions."""
+        self.log("Building course co-occurrence counts...")
+        self.cooccurrence = CooccurrenceRecommender.from_ratings(self.ratings)
+        self.log(f"{Fore.GREEN}✓ Co-occurrence engine ready with {len(self.cooccurrence.item_counts)} courses{Style.RESET_ALL}")
+    
+    def load_user_interactions(self):
+        self.log(f"Loading user interactions from {self.interactions_source}...")
+        self.set_ratings(load_ratings(self.interactions_source, self.courses))
+        self.log(f"{Fore.GREEN}✓ Loaded {len(self.ratings)} user-course interactions{Style.RESET_ALL}")
+    
+    def set_ratings(self, ratings):
+        """Use ``ratings`` (user_id, course_id, rating, subject, level rows) as the training interactions."""
+        self.unique_course_ids = self.courses['course_id'].unique()
+        self.ratings = ratings
+        self.unique_user_ids = ratings['user_id'].unique()
     
     def create_user_interactions(self):
         num_users = 1000
-        print(f"Simulating {num_users} users and their course interactions...")
+        self.log(f"Simulating {num_users} users and their course interactions...")
         
         user_ids = [f"user_{i}" for i in range(num_users)]
         
@@ -68,16 +160,13 @@ class CourseRecommender:
                             'level': course['level']
                         })
         
-        self.ratings = pd.DataFrame(interactions)
-        print(f"{Fore.GREEN}✓ Generated {len(self.ratings)} user-course interactions{Style.RESET_ALL}")
-        self.unique_user_ids = self.ratings['user_id'].unique()
-        self.unique_course_ids = self.courses['course_id'].unique()
+        self.set_ratings(pd.DataFrame(interactions))
+        self.log(f"{Fore.GREEN}✓ Generated {len(self.ratings)} user-course interactions{Style.RESET_ALL}")
     
-    def build_and_train_model(self):
+    def build_and_train_model(self, embedding_dimension=32, epochs=5, learning_rate=0.001, batch_size=256):
         """Build and train the recommendation model."""
-        print("Building and training the recommendation model...")
+        self.log("Building and training the recommendation model...")
         
-        embedding_dimension = 32
         self.user_ids_vocabulary = tf.keras.layers.StringLookup(mask_token=None)
         self.user_ids_vocabulary.adapt(tf.data.Dataset.from_tensor_slices(self.unique_user_ids))
         self.course_ids_vocabulary = tf.keras.layers.StringLookup(mask_token=None)
@@ -109,9 +198,9 @@ class CourseRecommender:
         self.model = RecommenderModel(self.user_model, self.course_model)
         self.model.compile(
             loss=tf.keras.losses.MeanSquaredError(),
-            optimizer=tf.keras.optimizers.Adam(learning_rate=0.001)
+            optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate)
         )
-        def make_dataset(ratings_data, batch_size=256, shuffle=True):
+        def make_dataset(ratings_data, batch_size=batch_size, shuffle=True):
             user_ids_tensor = tf.convert_to_tensor(ratings_data['user_id'].values)
             course_ids_tensor = tf.convert_to_tensor(ratings_data['course_id'].values)
             ratings_tensor = tf.convert_to_tensor(ratings_data['rating'].values, dtype=tf.float32)
@@ -126,12 +215,12 @@ class CourseRecommender:
             return dataset
         
         train_dataset = make_dataset(self.ratings)
-        self.model.fit(train_dataset, epochs=5, verbose=0)
-        print(f"{Fore.GREEN}✓ Model training complete{Style.RESET_ALL}")
+        self.model.fit(train_dataset, epochs=epochs, verbose=0)
+        self.log(f"{Fore.GREEN}✓ Model training complete{Style.RESET_ALL}")
     
     def generate_embeddings(self):
         """Generate embeddings for all users and courses."""
-        print("Generating embeddings...")
+        self.log("Generating embeddings...")
         
         self.user_embeddings = {}
         for user_id in self.unique_user_ids:
@@ -143,10 +232,15 @@ class CourseRecommender:
                 course_embedding = self.course_model(tf.constant([course_id])).numpy()[0]
                 self.course_embeddings[course_id] = course_embedding
         
-        print(f"{Fore.GREEN}✓ Generated embeddings for {len(self.user_embeddings)} users and {len(self.course_embeddings)} courses{Style.RESET_ALL}")
+        self.log(f"{Fore.GREEN}✓ Generated embeddings for {len(self.user_embeddings)} users and {len(self.course_embeddings)} courses{Style.RESET_ALL}")
     
     def recommend_courses_to_user(self, user_id, top_k=5):
         """Recommend courses to a user based on embedding similarity."""
+        if not self.is_model_ready():
+            return self.recommend_courses_by_metadata(user_id, top_k)
+        if self.engine == "cooccurrence":
+            top_course_ids = [course_id for course_id, _ in self.cooccurrence.recommend_for_user(user_id, top_k)]
+            return self.ranked_course_rows(top_course_ids)
         if user_id not in self.user_embeddings:
             print(f"User {user_id} not found in embeddings")
             return pd.DataFrame()
@@ -163,8 +257,34 @@ class CourseRecommender:
             ['course_id', 'course_title', 'subject', 'level', 'price']
         ]
     
+    def ranked_course_rows(self, course_ids):
+        """Catalog rows for ``course_ids``, keeping their ranking order."""
+        course_ids = [course_id for course_id in course_ids if course_id in self.courses_by_id.index]
+        return self.courses_by_id.loc[course_ids][
+            ['course_id', 'course_title', 'subject', 'level', 'price']
+        ].reset_index(drop=True)
+    
+    def recommend_courses_by_metadata(self, user_id, top_k=5):
+        """Popular courses in the user's subjects, used until the model is ready."""
+        ratings = self.ratings
+        if ratings is not None:
+            preferred_subjects = ratings.loc[ratings['user_id'] == user_id, 'subject'].unique()
+            recommended = pd.concat([self.courses_by_subject[subject] for subject in preferred_subjects]
+                                    + [self.sorted_courses]).drop_duplicates('course_id')
+        else:
+            recommended = self.sorted_courses
+        
+        return recommended.head(top_k)[['course_id', 'course_title', 'subject', 'level', 'price']]
+    
     def find_similar_courses(self, course_id, top_k=5):
         """Find similar courses based on embedding similarity."""
+        if not self.is_model_ready():
+            return self.get_similar_courses_by_metadata(course_id, top_k)
+        if self.engine == "cooccurrence":
+            if course_id not in self.cooccurrence:
+                return self.get_similar_courses_by_metadata(course_id, top_k)
+            top_course_ids = [other_id for other_id, _ in self.cooccurrence.similar_courses(course_id, top_k)]
+            return self.ranked_course_rows(top_course_ids)
         if course_id not in self.course_embeddings:
             print(f"Course {course_id} not found in embeddings")
             return self.get_similar_courses_by_metadata(course_id, top_k)
@@ -185,16 +305,14 @@ class CourseRecommender:
     
     def get_similar_courses_by_metadata(self, course_id, num_recommendations=5):
         """Get similar courses based on subject and level."""
-        course = self.courses[self.courses['course_id'] == course_id].iloc[0]
+        course = self.courses_by_id.loc[course_id]
         
-        similar_courses = self.courses[
-            (self.courses['subject'] == course['subject']) & 
-            (self.courses['level'] == course['level']) &
-            (self.courses['course_id'] != course_id)
+        subject_courses = self.courses_by_subject[course['subject']]
+        similar_courses = subject_courses[
+            (subject_courses['level'] == course['level']) &
+            (subject_courses['course_id'] != course_id)
         ]
         
-        similar_courses = similar_courses.sort_values('num_subscribers', ascending=False)
-        
         return similar_courses[['course_id', 'course_title', 'subject', 'level', 'price']].head(num_recommendations)
     
     def display_courses(self, courses_df, title=None, start_idx=0, per_page=10):
@@ -216,7 +334,7 @@ class CourseRecommender:
             print(f"   Subject: {course['subject']} | Level: {course['level']} | Price: ${course['price']}")
             print(f"   ID: {course['course_id']}")
         
-        print("\n" + "-" * os.get_terminal_size().columns)
+        print("\n" + "-" * self.terminal_width)
         controls = []
         if start_idx > 0:
             controls.append(f"{Fore.BLUE}[P] Previous page{Style.RESET_ALL}")
@@ -226,7 +344,7 @@ class CourseRecommender:
         controls.append(f"{Fore.BLUE}[B] Back to main menu{Style.RESET_ALL}")
         
         print(" | ".join(controls))
-        print("-" * os.get_terminal_size().columns)
+        print("-" * self.terminal_width)
         
         return end_idx
     
@@ -237,7 +355,11 @@ class CourseRecommender:
         while True:
             self.print_header("Main Menu")
             
-            print(f"{Fore.CYAN}Current User: {current_user}{Style.RESET_ALL}\n")
+            print(f"{Fore.CYAN}Current User: {current_user}{Style.RESET_ALL}")
+            if self.is_model_ready():
+                print(f"{Fore.GREEN}Recommendation model ready{Style.RESET_ALL}\n")
+            else:
+                print(f"{Fore.MAGENTA}{self.status}{Style.RESET_ALL}\n")
             print(f"{Fore.YELLOW}[1] Browse All Courses{Style.RESET_ALL}")
             print(f"{Fore.YELLOW}[2] Browse by Subject{Style.RESET_ALL}")
             print(f"{Fore.YELLOW}[3] Course Recommendations for You{Style.RESET_ALL}")
@@ -253,7 +375,7 @@ class CourseRecommender:
             elif choice == '3':
                 self.show_recommendations(current_user)
             elif choice == '4':
-                current_user = self.change_user()
+                current_user = self.change_user(current_user)
             elif choice == '5':
                 self.print_header("Thank you for using the Course Recommender!")
                 break
@@ -262,7 +384,7 @@ class CourseRecommender:
     
     def browse_all_courses(self):
         """Browse all courses with pagination."""
-        sorted_courses = self.courses.sort_values('num_subscribers', ascending=False)
+        sorted_courses = self.sorted_courses
         
         start_idx = 0
         per_page = 10
@@ -287,7 +409,7 @@ class CourseRecommender:
     
     def browse_by_subject(self):
         """Browse courses by subject."""
-        subjects = sorted(self.courses['subject'].unique())
+        subjects = self.subjects
         
         self.print_header("Browse by Subject")
         
@@ -304,7 +426,7 @@ class CourseRecommender:
             subject_idx = int(choice) - 1
             selected_subject = subjects[subject_idx]
             
-            subject_courses = self.courses[self.courses['subject'] == selected_subject].sort_values('num_subscribers', ascending=False)
+            subject_courses = self.courses_by_subject[selected_subject]
             
             start_idx = 0
             per_page = 10
@@ -331,6 +453,7 @@ class CourseRecommender:
     
     def show_recommendations(self, user_id):
         """Show course recommendations for a user."""
+        model_ready = self.is_model_ready()
         recommendations = self.recommend_courses_to_user(user_id, top_k=10)
         
         start_idx = 0
@@ -338,6 +461,8 @@ class CourseRecommender:
         
         while True:
             end_idx = self.display_courses(recommendations, f"Recommended Courses for You", start_idx, per_page)
+            if not model_ready:
+                print(f"{Fore.MAGENTA}Model still training: showing popular courses in your subjects.{Style.RESET_ALL}")
             
             choice = input("\nEnter a course number to view details, P/N for pagination, or B to go back: ").strip().upper()
             
@@ -356,7 +481,7 @@ class CourseRecommender:
     
     def view_course_details(self, course_id):
         """View details of a specific course."""
-        course = self.courses[self.courses['course_id'] == course_id].iloc[0]
+        course = self.courses_by_id.loc[course_id]
         
         self.print_header(f"Course Details: {course['course_title']}")
         
@@ -378,9 +503,9 @@ class CourseRecommender:
                 print(f"\n{idx}. {Fore.GREEN}{similar['course_title']}{Style.RESET_ALL}")
                 print(f"   Subject: {similar['subject']} | Level: {similar['level']} | Price: ${similar['price']}")
         
-        print("\n" + "-" * os.get_terminal_size().columns)
+        print("\n" + "-" * self.terminal_width)
         print(f"{Fore.BLUE}[V] View a similar course | [B] Back to previous menu{Style.RESET_ALL}")
-        print("-" * os.get_terminal_size().columns)
+        print("-" * self.terminal_width)
         
         choice = input("\nEnter your choice: ").strip().upper()
         
@@ -399,12 +524,20 @@ class CourseRecommender:
             print(f"{Fore.RED}Invalid choice.{Style.RESET_ALL}")
             time.sleep(1)
     
-    def change_user(self):
+    def change_user(self, current_user="user_0"):
         """Change the current user."""
         self.print_header("Change User")
         
+        if self.unique_user_ids is None:
+            print(f"{Fore.MAGENTA}Users are still being loaded, keeping {current_user}.{Style.RESET_ALL}")
+            time.sleep(1)
+            return current_user
+        
         print("Enter a user ID or leave blank to use a random user.")
-        print(f"Format: user_X where X is a number between 0 and {len(self.unique_user_ids)-1}")
+        if self.interactions_source:
+            print(f"{len(self.unique_user_ids)} users loaded from {self.interactions_source}")
+        else:
+            print(f"Format: user_X where X is a number between 0 and {len(self.unique_user_ids)-1}")
         
         user_input = input("\nUser ID: ").strip()
         
@@ -421,5 +554,8 @@ class CourseRecommender:
 
 
 if __name__ == "__main__":
-    recommender = CourseRecommender()
+    recommender = CourseRecommender(
+        interactions_source=os.environ.get('INTERACTIONS_SOURCE'),
+        engine=os.environ.get('RECOMMENDER_ENGINE', 'embedding')
+    )
     recommender.run_interactive()
\ No newline at end of file
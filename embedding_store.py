@@ -0,0 +1,239 @@
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+PRECISIONS = ('float32', 'float16', 'int8')
+
+
+def top_k_indices(scores, k):
+    """Return the column indices of the k highest scores per row, best first."""
+    scores = np.atleast_2d(scores)
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+class QuantizedEmbeddingStore:
+    """Embeddings for a set of ids packed into one contiguous matrix.
+
+    float32 and float16 rows are stored as-is. int8 rows are stored with one
+    float32 scale per row (max(|x|) / 127), so a row is recovered as
+    ``data[i] * scales[i]``. Scoring never materialises the full float32
+    matrix: rows are upcast a chunk at a time and the per-row scale is applied
+    to the dot product instead of to the row.
+
+    Rows are kept sorted by id and looked up with ``np.searchsorted``, so the
+    only index is the ``ids`` array itself rather than a Python object per id.
+    """
+
+    def __init__(self, ids, matrix, precision='float32', chunk_size=4096):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISIONS}")
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+            raise ValueError("matrix must have one row per id")
+
+        ids = _as_id_array(ids)
+        order = np.argsort(ids, kind='stable')
+        self.ids = ids[order]
+        matrix = matrix[order]
+        self.precision = precision
+        self.chunk_size = chunk_size
+        self.dimension = matrix.shape[1]
+
+        if precision == 'int8':
+            max_abs = np.abs(matrix).max(axis=1)
+            self.scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+            self.data = np.clip(np.rint(matrix / self.scales[:, None]), -127, 127).astype(np.int8)
+        else:
+            self.scales = None
+            self.data = np.ascontiguousarray(matrix, dtype=precision)
+
+    @classmethod
+    def from_dict(cls, embeddings, precision='float32', chunk_size=4096):
+        ids = list(embeddings.keys())
+        if ids:
+            matrix = np.stack([embeddings[id_] for id_ in ids])
+        else:
+            matrix = np.empty((0, 0), dtype=np.float32)
+        return cls(ids, matrix, precision=precision, chunk_size=chunk_size)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, id_):
+        return bool(self._find([id_])[1][0])
+
+    def _find(self, ids):
+        """Return (rows, found) for ``ids`` by binary search over the sorted ids."""
+        ids = _as_id_array(ids)
+        if len(self.ids) == 0 or ids.dtype.kind != self.ids.dtype.kind:
+            return np.zeros(len(ids), dtype=np.int64), np.zeros(len(ids), dtype=bool)
+        rows = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        return rows, self.ids[rows] == ids
+
+    def _rows(self, ids):
+        rows, found = self._find(ids)
+        if not found.all():
+            raise KeyError(_as_id_array(ids)[~found][0])
+        return rows
+
+    @property
+    def vector_nbytes(self):
+        """Bytes held by the embedding matrix and scales only."""
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the whole store: vectors plus the sorted ``ids`` array."""
+        return self.vector_nbytes + self.ids.nbytes
+
+    def dequantize(self, start, stop):
+        rows = self.data[start:stop].astype(np.float32)
+        if self.scales is not None:
+            rows *= self.scales[start:stop, None]
+        return rows
+
+    def vector(self, id_):
+        """Return the float32 embedding for a single id."""
+        row = int(self._rows([id_])[0])
+        return self.dequantize(row, row + 1)[0]
+
+    def vectors(self, ids):
+        if len(ids) == 0:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return self._dequantize_rows(self._rows(ids))
+
+    def _dequantize_rows(self, rows):
+        out = self.data[rows].astype(np.float32)
+        if self.scales is not None:
+            out *= self.scales[rows, None]
+        return out
+
+    def to_float32(self):
+        return self.dequantize(0, len(self))
+
+    def subset(self, ids):
+        """Return a new store with only ``ids``, keeping the same precision.
+
+        Re-quantizing a dequantized row is exact: float16 round-trips through
+        float32, and an int8 row's largest element maps back to 127 and so to
+        the same scale.
+        """
+        rows = np.sort(self._rows(ids))
+        return QuantizedEmbeddingStore(self.ids[rows], self._dequantize_rows(rows),
+                                       precision=self.precision, chunk_size=self.chunk_size)
+
+    def batch_scores(self, queries):
+        """Dot product of each query against every stored row.
+
+        ``queries`` is (n_queries, dimension) float32; the result is
+        (n_queries, len(self)) float32.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        scores = np.empty((queries.shape[0], len(self)), dtype=np.float32)
+        for start in range(0, len(self), self.chunk_size):
+            stop = min(start + self.chunk_size, len(self))
+            chunk = self.data[start:stop].astype(np.float32)
+            block = queries @ chunk.T
+            if self.scales is not None:
+                block *= self.scales[start:stop]
+            scores[:, start:stop] = block
+        return scores
+
+    def scores(self, query):
+        return self.batch_scores(query)[0]
+
+    def top_k(self, query, k, exclude=None):
+        """Return (ids, scores) of the k rows scoring highest against ``query``."""
+        scores = self.scores(query)
+        if exclude is not None:
+            rows, found = self._find([exclude])
+            if found[0]:
+                scores[rows[0]] = -np.inf
+                k = min(k, len(self) - 1)
+        idx = top_k_indices(scores, k)[0]
+        return self.ids[idx], scores[idx]
+
+
+def _as_id_array(ids):
+    ids = np.asarray(ids)
+    # Object arrays (e.g. from pandas unique()) search and compare as fixed-width strings
+    return ids.astype(str) if ids.dtype == object else ids
+
+
+def dict_nbytes(embeddings):
+    """Approximate memory held by a ``{id: np.ndarray}`` embedding dict, keys included."""
+    total = sys.getsizeof(embeddings)
+    for id_, vector in embeddings.items():
+        total += sys.getsizeof(id_) + sys.getsizeof(vector)
+    return total
+
+
+def compare_precisions(user_embeddings, course_embeddings, top_k=10, precisions=PRECISIONS, batch_size=1024):
+    """Report memory use and top-k agreement of each precision against float32.
+
+    ``memory_saved_pct`` compares the full stores (vectors and the sorted
+    ids array) against the ``{id: np.ndarray}`` dicts, keys included.
+    ``topk_overlap`` is the mean fraction of each user's float32 top-k that
+    the quantized store also returns in its top-k.
+    """
+    baseline_bytes = dict_nbytes(user_embeddings) + dict_nbytes(course_embeddings)
+    reference_users = QuantizedEmbeddingStore.from_dict(user_embeddings, 'float32')
+    reference_courses = QuantizedEmbeddingStore.from_dict(course_embeddings, 'float32')
+    queries = reference_users.to_float32()
+
+    reference_top = []
+    for start in range(0, len(queries), batch_size):
+        scores = reference_courses.batch_scores(queries[start:start + batch_size])
+        reference_top.append(top_k_indices(scores, top_k))
+    reference_top = np.concatenate(reference_top) if reference_top else np.empty((0, top_k), dtype=np.int64)
+    k = reference_top.shape[1]
+
+    rows = []
+    for precision in precisions:
+        users = QuantizedEmbeddingStore.from_dict(user_embeddings, precision)
+        courses = QuantizedEmbeddingStore.from_dict(course_embeddings, precision)
+        user_vectors = users.to_float32()
+
+        overlap = 0
+        for start in range(0, len(user_vectors), batch_size):
+            scores = courses.batch_scores(user_vectors[start:start + batch_size])
+            top = top_k_indices(scores, top_k)
+            expected = reference_top[start:start + batch_size]
+            overlap += sum(len(np.intersect1d(a, b, assume_unique=True)) for a, b in zip(top, expected))
+
+        store_bytes = users.nbytes + courses.nbytes
+        rows.append({
+            'precision': precision,
+            'user_bytes': users.nbytes,
+            'course_bytes': courses.nbytes,
+            'vector_bytes': users.vector_nbytes + courses.vector_nbytes,
+            'store_bytes': store_bytes,
+            'dict_bytes': baseline_bytes,
+            'memory_saved_pct': 100.0 * (1 - store_bytes / baseline_bytes) if baseline_bytes else 0.0,
+            'topk_overlap': overlap / (len(user_vectors) * k) if len(user_vectors) and k else 1.0,
+        })
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare embedding precisions for the trained recommender")
+    parser.add_argument('--top-k', type=int, default=10)
+    args = parser.parse_args()
+
+    from course_recommender import CourseRecommender
+
+    recommender = CourseRecommender(initialize="now")
+
+    report = compare_precisions(recommender.user_embeddings, recommender.course_embeddings, top_k=args.top_k)
+    print(report.to_string(index=False))
@@ -0,0 +1,191 @@
+import os
+import time
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+
+from embedding_store import top_k_indices
+
+
+def train_test_split_interactions(ratings, test_fraction=0.2, seed=42):
+    """Hold out a seeded fraction of each user's interactions for testing.
+
+    Users with a single interaction stay entirely in the training set, so
+    every test user still has at least one training interaction.
+    """
+    rng = np.random.default_rng(seed)
+    shuffled = ratings.iloc[rng.permutation(len(ratings))]
+    by_user = shuffled.groupby('user_id', sort=False)
+    position = by_user.cumcount().to_numpy()
+    counts = by_user['user_id'].transform('size').to_numpy()
+    num_test = np.where(counts >= 2, np.maximum(1, np.floor(counts * test_fraction)), 0)
+    is_test = position < num_test
+    return shuffled[~is_test].sort_index(), shuffled[is_test].sort_index()
+
+
+def _pair_rows(interactions, user_index, course_index):
+    users = interactions['user_id'].map(user_index)
+    courses = interactions['course_id'].map(course_index)
+    known = users.notna().to_numpy() & courses.notna().to_numpy()
+    return users.to_numpy()[known].astype(np.int64), courses.to_numpy()[known].astype(np.int64)
+
+
+def evaluate_embeddings(user_ids, user_matrix, course_ids, course_matrix, train, test,
+                        k_values=(5, 10), batch_size=1024):
+    """Compute recall@k, precision@k, NDCG@k and catalog coverage@k.
+
+    Users are scored in batches of ``batch_size`` against every course with a
+    single matrix product; courses the user already interacted with in
+    ``train`` are masked out before ranking. Test interactions on courses the
+    model has no embedding for still count towards each user's relevant set,
+    so they can only lower recall.
+    """
+    user_ids = np.asarray(user_ids)
+    course_ids = np.asarray(course_ids)
+    user_index = {user_id: row for row, user_id in enumerate(user_ids)}
+    course_index = {course_id: col for col, course_id in enumerate(course_ids)}
+    user_matrix = np.asarray(user_matrix, dtype=np.float32)
+    course_matrix = np.asarray(course_matrix, dtype=np.float32)
+    k_values = sorted(k_values)
+    max_k = min(k_values[-1], len(course_ids))
+
+    test = test[test['user_id'].isin(user_index)].drop_duplicates(['user_id', 'course_id'])
+    relevant_counts = test.groupby('user_id').size()
+    eval_users = np.array([user_index[user_id] for user_id in relevant_counts.index], dtype=np.int64)
+    num_relevant = relevant_counts.to_numpy()
+
+    train_users, train_courses = _pair_rows(train, user_index, course_index)
+    test_users, test_courses = _pair_rows(test, user_index, course_index)
+    # Position of each user within eval_users, -1 for users that are not evaluated
+    eval_position = np.full(len(user_ids), -1, dtype=np.int64)
+    eval_position[eval_users] = np.arange(len(eval_users))
+
+    discounts = 1.0 / np.log2(np.arange(2, max_k + 2))
+    ideal_dcg = np.cumsum(discounts)
+    sums = {k: {'recall': 0.0, 'precision': 0.0, 'ndcg': 0.0} for k in k_values}
+    recommended = {k: np.zeros(len(course_ids), dtype=bool) for k in k_values}
+
+    for start in range(0, len(eval_users), batch_size):
+        batch = eval_users[start:start + batch_size]
+        scores = user_matrix[batch] @ course_matrix.T
+
+        in_batch = (eval_position[train_users] >= start) & (eval_position[train_users] < start + len(batch))
+        scores[eval_position[train_users[in_batch]] - start, train_courses[in_batch]] = -np.inf
+
+        relevant = np.zeros(scores.shape, dtype=bool)
+        in_batch = (eval_position[test_users] >= start) & (eval_position[test_users] < start + len(batch))
+        relevant[eval_position[test_users[in_batch]] - start, test_courses[in_batch]] = True
+
+        top = top_k_indices(scores, max_k)
+        hits = np.take_along_axis(relevant, top, axis=1)
+        batch_relevant = num_relevant[start:start + len(batch)]
+
+        for k in k_values:
+            k_hits = hits[:, :k]
+            num_hits = k_hits.sum(axis=1)
+            dcg = (k_hits * discounts[:k_hits.shape[1]]).sum(axis=1)
+            idcg = ideal_dcg[np.minimum(batch_relevant, k_hits.shape[1]) - 1]
+            sums[k]['recall'] += (num_hits / batch_relevant).sum()
+            sums[k]['precision'] += (num_hits / k).sum()
+            sums[k]['ndcg'] += (dcg / idcg).sum()
+            recommended[k][top[:, :k].ravel()] = True
+
+    metrics = {'num_eval_users': len(eval_users)}
+    for k in k_values:
+        for name, total in sums[k].items():
+            metrics[f'{name}@{k}'] = total / len(eval_users) if len(eval_users) else 0.0
+        metrics[f'coverage@{k}'] = recommended[k].mean() if len(course_ids) else 0.0
+    return metrics
+
+
+def train_and_evaluate(config, courses, train, test, k_values=(5, 10), seed=42):
+    """Train the embedding model with ``config`` on ``train`` and evaluate it on ``test``."""
+    import tensorflow as tf
+    from course_recommender import CourseRecommender
+
+    tf.random.set_seed(seed)
+    recommender = CourseRecommender(courses=courses, initialize="skip")
+    recommender.set_ratings(train)
+
+    start = time.perf_counter()
+    recommender.build_and_train_model(**config)
+    train_seconds = time.perf_counter() - start
+
+    user_ids = recommender.unique_user_ids
+    course_ids = train['course_id'].unique()
+    user_matrix = recommender.user_model(tf.constant(user_ids)).numpy()
+    course_matrix = recommender.course_model(tf.constant(course_ids)).numpy()
+
+    start = time.perf_counter()
+    metrics = evaluate_embeddings(user_ids, user_matrix, course_ids, course_matrix, train, test, k_values)
+    eval_seconds = time.perf_counter() - start
+
+    return {**config, **metrics, 'train_seconds': train_seconds, 'eval_seconds': eval_seconds}
+
+
+def _init_sweep_worker(threads):
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(threads)
+
+
+def run_sweep(configs, courses, train, test, k_values=(5, 10), workers=None, seed=42, output=None):
+    """Evaluate every config in its own process and return the results table.
+
+    Workers are started with spawn so each gets a fresh TensorFlow runtime,
+    and TensorFlow's thread pools are split evenly between them.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(configs)) or 1
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_sweep_worker, initargs=(threads,)) as pool:
+        futures = [pool.submit(train_and_evaluate, config, courses, train, test, k_values, seed) for config in configs]
+        for future in as_completed(futures):
+            result = future.result()
+            print(", ".join(f"{key}={value:.4g}" if isinstance(value, float) else f"{key}={value}"
+                            for key, value in result.items()))
+            results.append(result)
+
+    table = pd.DataFrame(results).sort_values(f'ndcg@{max(k_values)}', ascending=False).reset_index(drop=True)
+    if output:
+        table.to_csv(output, index=False)
+    return table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sweep embedding model hyperparameters on a held-out split")
+    parser.add_argument('--courses-file', default='courses.csv')
+    parser.add_argument('--interactions', default=None,
+                        help="SQLite database, .csv or .jsonl log to evaluate on instead of simulated users")
+    parser.add_argument('--dimensions', type=int, nargs='+', default=[16, 32, 64])
+    parser.add_argument('--epochs', type=int, nargs='+', default=[5])
+    parser.add_argument('--learning-rates', type=float, nargs='+', default=[0.001])
+    parser.add_argument('--k', type=int, nargs='+', default=[5, 10])
+    parser.add_argument('--test-fraction', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='sweep_results.csv')
+    args = parser.parse_args()
+
+    from course_recommender import CourseRecommender
+
+    recommender = CourseRecommender(args.courses_file, interactions_source=args.interactions, initialize="skip")
+    if args.interactions:
+        recommender.load_user_interactions()
+    else:
+        recommender.create_user_interactions()
+    train, test = train_test_split_interactions(recommender.ratings, args.test_fraction, args.seed)
+    print(f"Split {len(recommender.ratings)} interactions into {len(train)} train / {len(test)} test")
+
+    configs = [
+        {'embedding_dimension': dimension, 'epochs': epochs, 'learning_rate': learning_rate}
+        for dimension, epochs, learning_rate in itertools.product(args.dimensions, args.epochs, args.learning_rates)
+    ]
+    table = run_sweep(configs, recommender.courses, train, test, args.k, args.workers, args.seed, args.output)
+    print(table.to_string(index=False))
+    print(f"Results written to {args.output}")
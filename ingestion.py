@@ -0,0 +1,261 @@
+import os
+import sqlite3
+import contextlib
+import argparse
+import numpy as np
+import pandas as pd
+
+DEFAULT_DB_PATH = os.path.join("course-recommender-platform", "prisma", "dev.db")
+
+# UserCourseView rows are implicit feedback; they train as this rating
+VIEW_RATING = 5.0
+
+
+class IdVocabulary:
+    """Growing string id -> int32 code mapping; codes are assigned in arrival order."""
+
+    def __init__(self, ids=()):
+        self.ids = []
+        self.index = {}
+        for id_ in ids:
+            self.add(id_)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, id_):
+        code = self.index.get(id_)
+        if code is None:
+            code = self.index[id_] = len(self.ids)
+            self.ids.append(id_)
+        return code
+
+    def encode(self, values):
+        values = pd.Series(values, dtype=object).astype(str)
+        codes = values.map(self.index)
+        if codes.isna().any():
+            for id_ in values[codes.isna()].unique():
+                self.add(id_)
+            codes = values.map(self.index)
+        return codes.to_numpy(dtype=np.int32)
+
+    def decode(self, codes):
+        return np.asarray(self.ids, dtype=object)[codes]
+
+
+def read_sqlite_views(db_path=DEFAULT_DB_PATH, since=None, chunk_size=50000):
+    """Yield UserCourseView rows viewed at or after ``since`` (epoch ms), oldest first.
+
+    Rows come off a single cursor with fetchmany, so only ``chunk_size`` rows
+    are held at a time. Re-reading rows at exactly ``since`` is harmless:
+    the ingestor deduplicates (user, course) pairs.
+    """
+    # sqlite3's own context manager only commits; closing() releases the handle
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        cursor = conn.execute(
+            'SELECT "userId", "courseId", "viewedAt" FROM "UserCourseView" '
+            'WHERE "viewedAt" >= ? ORDER BY "viewedAt"',
+            (since if since is not None else 0,),
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunk = pd.DataFrame(rows, columns=['user_id', 'course_id', 'timestamp'])
+            chunk['rating'] = VIEW_RATING
+            yield chunk
+
+
+def _normalize_chunk(chunk, user_column, course_column, rating_column, timestamp_column):
+    # Rows without both ids cannot be attributed; encoding them would create a "nan" user or course
+    chunk = chunk.dropna(subset=[user_column, course_column])
+    normalized = pd.DataFrame({
+        'user_id': chunk[user_column],
+        'course_id': chunk[course_column],
+    })
+    if rating_column in chunk:
+        # A single NaN rating would turn the training loss, and every embedding, into NaN
+        normalized['rating'] = chunk[rating_column].fillna(VIEW_RATING).astype(np.float32)
+    else:
+        normalized['rating'] = VIEW_RATING
+    if timestamp_column in chunk:
+        normalized['timestamp'] = chunk[timestamp_column]
+    return normalized
+
+
+def read_csv_chunks(path, chunk_size=100000, user_column='user_id', course_column='course_id',
+                    rating_column='rating', timestamp_column='timestamp'):
+    """Yield a CSV interaction log in chunks of ``chunk_size`` rows.
+
+    Logs without a rating column are treated as views (VIEW_RATING), as are
+    rows with an empty rating; rows missing a user or course id are dropped.
+    """
+    reader = pd.read_csv(path, chunksize=chunk_size, dtype={user_column: str, course_column: str})
+    for chunk in reader:
+        yield _normalize_chunk(chunk, user_column, course_column, rating_column, timestamp_column)
+
+
+def read_jsonl_chunks(path, chunk_size=100000, user_column='user_id', course_column='course_id',
+                      rating_column='rating', timestamp_column='timestamp'):
+    """Yield a JSON-lines interaction log in chunks of ``chunk_size`` rows."""
+    reader = pd.read_json(path, lines=True, chunksize=chunk_size, dtype={user_column: str, course_column: str})
+    with reader:
+        for chunk in reader:
+            yield _normalize_chunk(chunk, user_column, course_column, rating_column, timestamp_column)
+
+
+class InteractionIngestor:
+    """Build deduplicated int32 training arrays from a stream of interaction chunks.
+
+    Each chunk is encoded against growing user and course vocabularies and
+    buffered. Once ``compact_every`` rows are buffered they are merged into
+    the compacted arrays, keeping only the latest interaction per
+    (user, course) pair. Memory therefore tracks the number of distinct
+    pairs plus one buffer, not the length of the log.
+    """
+
+    def __init__(self, compact_every=1000000):
+        self.compact_every = compact_every
+        self.users = IdVocabulary()
+        self.courses = IdVocabulary()
+        self.watermark = None
+        self.rows_read = 0
+        self._user_idx = np.empty(0, dtype=np.int32)
+        self._course_idx = np.empty(0, dtype=np.int32)
+        self._rating = np.empty(0, dtype=np.float32)
+        self._pending = []
+        self._pending_rows = 0
+
+    def add_chunk(self, chunk):
+        if chunk.empty:
+            return
+        self._pending.append((
+            self.users.encode(chunk['user_id']),
+            self.courses.encode(chunk['course_id']),
+            chunk['rating'].to_numpy(dtype=np.float32),
+        ))
+        self._pending_rows += len(chunk)
+        self.rows_read += len(chunk)
+        if 'timestamp' in chunk and pd.api.types.is_numeric_dtype(chunk['timestamp']):
+            latest = int(chunk['timestamp'].max())
+            self.watermark = latest if self.watermark is None else max(self.watermark, latest)
+        if self._pending_rows >= self.compact_every:
+            self._compact()
+
+    def ingest(self, chunks):
+        for chunk in chunks:
+            self.add_chunk(chunk)
+        return self
+
+    def _compact(self):
+        if not self._pending:
+            return
+        user_idx = np.concatenate([self._user_idx] + [part[0] for part in self._pending])
+        course_idx = np.concatenate([self._course_idx] + [part[1] for part in self._pending])
+        rating = np.concatenate([self._rating] + [part[2] for part in self._pending])
+        self._pending = []
+        self._pending_rows = 0
+
+        keys = (user_idx.astype(np.int64) << 32) | course_idx.astype(np.int64)
+        # np.unique keeps the first occurrence; search the reversed keys so the latest row wins
+        _, reversed_first = np.unique(keys[::-1], return_index=True)
+        keep = len(keys) - 1 - reversed_first
+        self._user_idx = user_idx[keep]
+        self._course_idx = course_idx[keep]
+        self._rating = rating[keep]
+
+    def training_arrays(self):
+        """Return (user_idx, course_idx, rating) sorted by user, one row per pair."""
+        self._compact()
+        return self._user_idx, self._course_idx, self._rating
+
+    def __len__(self):
+        self._compact()
+        return len(self._user_idx)
+
+    def to_ratings(self, courses):
+        """Return a ``ratings`` DataFrame in the shape the recommenders train on.
+
+        Interactions on courses missing from the catalog are dropped, since
+        they cannot be shown or recommended.
+        """
+        user_idx, course_idx, rating = self.training_arrays()
+        ratings = pd.DataFrame({
+            'user_id': self.users.decode(user_idx),
+            'course_id': self.courses.decode(course_idx),
+            'rating': rating,
+        })
+        catalog = courses[['course_id', 'subject', 'level']].drop_duplicates('course_id')
+        return ratings.merge(catalog, on='course_id', how='inner')
+
+    def save(self, path):
+        user_idx, course_idx, rating = self.training_arrays()
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                user_idx=user_idx,
+                course_idx=course_idx,
+                rating=rating,
+                user_ids=np.asarray(self.users.ids, dtype=str),
+                course_ids=np.asarray(self.courses.ids, dtype=str),
+                watermark=np.int64(self.watermark if self.watermark is not None else -1),
+                rows_read=np.int64(self.rows_read),
+            )
+
+    @classmethod
+    def load(cls, path, compact_every=1000000):
+        ingestor = cls(compact_every=compact_every)
+        with np.load(path) as state:
+            ingestor.users = IdVocabulary(state['user_ids'].tolist())
+            ingestor.courses = IdVocabulary(state['course_ids'].tolist())
+            ingestor._user_idx = state['user_idx']
+            ingestor._course_idx = state['course_idx']
+            ingestor._rating = state['rating']
+            watermark = int(state['watermark'])
+            ingestor.watermark = watermark if watermark >= 0 else None
+            ingestor.rows_read = int(state['rows_read'])
+        return ingestor
+
+
+def read_interactions(source, since=None, chunk_size=100000):
+    """Pick a chunked reader for ``source`` by file extension."""
+    extension = os.path.splitext(source)[1].lower()
+    if extension in ('.db', '.sqlite', '.sqlite3'):
+        return read_sqlite_views(source, since=since, chunk_size=chunk_size)
+    if extension == '.csv':
+        return read_csv_chunks(source, chunk_size=chunk_size)
+    if extension in ('.jsonl', '.json', '.ndjson'):
+        return read_jsonl_chunks(source, chunk_size=chunk_size)
+    raise ValueError(f"Unsupported interactions source: {source}")
+
+
+def load_ratings(source, courses, chunk_size=100000):
+    """Ingest ``source`` and return it as a ``ratings`` DataFrame."""
+    ingestor = InteractionIngestor().ingest(read_interactions(source, chunk_size=chunk_size))
+    return ingestor.to_ratings(courses)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ingest interaction logs into deduplicated training arrays")
+    parser.add_argument('source', nargs='?', default=DEFAULT_DB_PATH,
+                        help="SQLite database (UserCourseView), .csv or .jsonl log")
+    parser.add_argument('--state', default=None,
+                        help=".npz file to resume from and save to; SQLite pulls continue from its watermark")
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.state and os.path.exists(args.state):
+        ingestor = InteractionIngestor.load(args.state)
+        print(f"Resuming from {args.state}: {len(ingestor)} interactions, watermark {ingestor.watermark}")
+    else:
+        ingestor = InteractionIngestor()
+
+    rows_before = ingestor.rows_read
+    ingestor.ingest(read_interactions(args.source, since=ingestor.watermark, chunk_size=args.chunk_size))
+    print(f"Read {ingestor.rows_read - rows_before} rows from {args.source}")
+    print(f"{len(ingestor)} distinct interactions across {len(ingestor.users)} users "
+          f"and {len(ingestor.courses)} courses (watermark {ingestor.watermark})")
+
+    if args.state:
+        ingestor.save(args.state)
+        print(f"Saved state to {args.state}")
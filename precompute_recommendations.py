@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+import numpy as np
+
+from embedding_store import QuantizedEmbeddingStore, top_k_indices
+
+# Set once in each pool worker by _init_worker, so the stores are pickled per worker, not per chunk
+_worker_state = {}
+
+# Default pool size cap: every worker holds its own copy of both stores, and
+# the chunks are memory-bound well before this many cores
+MAX_DEFAULT_WORKERS = 8
+
+
+def model_fingerprint(user_store, course_store):
+    """Hash of the embeddings a table was computed from, used to detect stale tables."""
+    digest = hashlib.sha1()
+    for store in (user_store, course_store):
+        digest.update(store.precision.encode('utf-8'))
+        digest.update('\0'.join(map(str, store.ids)).encode('utf-8'))
+        digest.update(np.ascontiguousarray(store.data).tobytes())
+        if store.scales is not None:
+            digest.update(store.scales.tobytes())
+    return digest.hexdigest()
+
+
+def _table_paths(prefix):
+    return {
+        'meta': f"{prefix}.meta.json",
+        'users': f"{prefix}.users.npy",
+        'courses': f"{prefix}.courses.npy",
+        'positions': f"{prefix}.positions.npy",
+        'scores': f"{prefix}.scores.npy",
+    }
+
+
+def _init_worker(user_store, course_store, paths, top_k):
+    _worker_state.update(user_store=user_store, course_store=course_store, paths=paths, top_k=top_k)
+
+
+def _precompute_chunk(bounds):
+    start, stop = bounds
+    user_store = _worker_state['user_store']
+    course_store = _worker_state['course_store']
+    paths = _worker_state['paths']
+
+    scores = course_store.batch_scores(user_store.dequantize(start, stop))
+    top = top_k_indices(scores, _worker_state['top_k'])
+
+    positions = np.load(paths['positions'], mmap_mode='r+')
+    top_scores = np.load(paths['scores'], mmap_mode='r+')
+    positions[start:stop] = top
+    top_scores[start:stop] = np.take_along_axis(scores, top, axis=1)
+    positions.flush()
+    top_scores.flush()
+    del positions, top_scores
+    return stop - start
+
+
+def precompute_top_k(user_store, course_store, prefix, top_k=50, chunk_size=1024, workers=None):
+    """Write the top_k courses of every user in ``user_store`` to an on-disk table.
+
+    Users are scored in chunks of ``chunk_size`` across a pool of ``workers``
+    processes (default: one per core, at most MAX_DEFAULT_WORKERS); each
+    worker writes its rows straight into memory-mapped ``.npy`` files (int32
+    course positions, float16 scores), so the parent never holds more than
+    the id arrays. Workers are spawned rather than forked from a caller that
+    may hold a live TensorFlow runtime.
+
+    The table is built under a temporary prefix and moved into place with
+    os.replace, so a server that still has the old files mapped keeps
+    reading the old table. The meta file is moved last and marks the table
+    as complete.
+    """
+    final_paths = _table_paths(prefix)
+    paths = _table_paths(f"{prefix}.tmp-{os.getpid()}")
+    try:
+        _write_table(user_store, course_store, paths, top_k, chunk_size, workers)
+    except BaseException:
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    # Without a meta file a half-replaced table is never read
+    if os.path.exists(final_paths['meta']):
+        os.remove(final_paths['meta'])
+    for name in ('users', 'courses', 'positions', 'scores', 'meta'):
+        os.replace(paths[name], final_paths[name])
+
+
+def _write_table(user_store, course_store, paths, top_k, chunk_size, workers):
+    num_users = len(user_store)
+    top_k = min(top_k, len(course_store))
+    np.save(paths['users'], user_store.ids.astype(str))
+    np.save(paths['courses'], course_store.ids.astype(str))
+    np.lib.format.open_memmap(paths['positions'], mode='w+', dtype=np.int32, shape=(num_users, top_k)).flush()
+    np.lib.format.open_memmap(paths['scores'], mode='w+', dtype=np.float16, shape=(num_users, top_k)).flush()
+
+    chunks = [(start, min(start + chunk_size, num_users)) for start in range(0, num_users, chunk_size)]
+    workers = min(workers or min(os.cpu_count() or 1, MAX_DEFAULT_WORKERS), len(chunks)) or 1
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(user_store, course_store, paths, top_k)) as pool:
+        for _ in pool.imap_unordered(_precompute_chunk, chunks):
+            pass
+
+    with open(paths['meta'], 'w') as f:
+        json.dump({
+            'top_k': top_k,
+            'num_users': num_users,
+            'num_courses': len(course_store),
+            'fingerprint': model_fingerprint(user_store, course_store),
+        }, f)
+
+
+class PrecomputedRecommendations:
+    """Read-only view of a table written by precompute_top_k."""
+
+    def __init__(self, prefix):
+        paths = _table_paths(prefix)
+        with open(paths['meta']) as f:
+            meta = json.load(f)
+        self.top_k = meta['top_k']
+        self.fingerprint = meta['fingerprint']
+        self.user_ids = np.load(paths['users'])
+        self.course_ids = np.load(paths['courses'])
+        self.positions = np.load(paths['positions'], mmap_mode='r')
+        self.scores = np.load(paths['scores'], mmap_mode='r')
+        # Sorted ids + searchsorted instead of a dict keeps lookups cheap for millions of users
+        self._order = np.argsort(self.user_ids)
+        self._sorted_user_ids = self.user_ids[self._order]
+
+    @staticmethod
+    def exists(prefix):
+        return os.path.exists(_table_paths(prefix)['meta'])
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def row_for(self, user_id):
+        idx = np.searchsorted(self._sorted_user_ids, user_id)
+        if idx < len(self._sorted_user_ids) and self._sorted_user_ids[idx] == user_id:
+            return int(self._order[idx])
+        return None
+
+    def lookup(self, user_id, top_k):
+        """Return the user's top_k course ids, or None if the table cannot answer."""
+        if top_k > self.top_k:
+            return None
+        row = self.row_for(user_id)
+        if row is None:
+            return None
+        return self.course_ids[self.positions[row, :top_k]].tolist()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the top-k precompute job on synthetic embeddings")
+    parser.add_argument('--output', default='recommendations')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--courses', type=int, default=3000)
+    parser.add_argument('--precision', default='float32')
+    parser.add_argument('--top-k', type=int, default=50)
+    parser.add_argument('--chunk-size', type=int, default=1024)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    user_store = QuantizedEmbeddingStore([f"user_{i}" for i in range(args.users)],
+                                         rng.normal(size=(args.users, 32)), args.precision)
+    course_store = QuantizedEmbeddingStore([str(i) for i in range(args.courses)],
+                                           rng.normal(size=(args.courses, 32)), args.precision)
+
+    start = time.perf_counter()
+    precompute_top_k(user_store, course_store, args.output, args.top_k, args.chunk_size, args.workers)
+    elapsed = time.perf_counter() - start
+
+    table = PrecomputedRecommendations(args.output)
+    table_bytes = table.positions.nbytes + table.scores.nbytes
+    print(f"Precomputed top-{table.top_k} for {len(table)} users in {elapsed:.2f}s "
+          f"({len(table) / elapsed:.0f} users/s, {table_bytes / 2**20:.1f} MiB on disk)")
+
+    check_k = min(10, table.top_k)
+    expected, _ = course_store.top_k(user_store.vector("user_0"), check_k)
+    assert table.lookup("user_0", check_k) == list(expected)
+    assert table.lookup("unknown_user", 10) is None
+    assert table.lookup("user_0", table.top_k + 1) is None
@@ -0,0 +1,273 @@
+import os
+import zlib
+import argparse
+import threading
+import multiprocessing
+from multiprocessing.connection import Listener, Client
+from multiprocessing import AuthenticationError
+import numpy as np
+
+from embedding_store import QuantizedEmbeddingStore, top_k_indices
+
+
+def shard_for(user_id, num_shards):
+    """Stable shard index for a user id (unlike hash(), identical in every process)."""
+    return zlib.crc32(str(user_id).encode('utf-8')) % num_shards
+
+
+def serve_shard(user_store, course_store, address=('127.0.0.1', 0), authkey=None, ready=None):
+    """Serve top-k requests for the users in ``user_store`` until told to shut down.
+
+    Requests are pickled tuples sent over a multiprocessing connection:
+
+    - ``('recommend', user_ids, top_k)`` -> list with ``(course_ids, scores)``
+      per user, or ``None`` for users this shard does not own
+    - ``('stats',)`` -> dict with the shard's user count and memory use
+    - ``('shutdown',)`` -> ``True``, then the shard exits
+    """
+    with Listener(address, authkey=authkey) as listener:
+        if ready is not None:
+            ready.send(listener.address)
+            ready.close()
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, OSError):
+                continue
+            with conn:
+                if not _handle_connection(conn, user_store, course_store):
+                    return
+
+
+def _handle_connection(conn, user_store, course_store):
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return True
+
+        # A bad request is answered with its exception so it can never take the shard down
+        try:
+            op = message[0]
+            if op == 'recommend':
+                _, user_ids, top_k = message
+                reply = _recommend(user_store, course_store, user_ids, top_k)
+            elif op == 'stats':
+                reply = {
+                    'pid': os.getpid(),
+                    'users': len(user_store),
+                    'user_bytes': user_store.nbytes,
+                    'course_bytes': course_store.nbytes,
+                }
+            elif op == 'shutdown':
+                _send(conn, True)
+                return False
+            else:
+                reply = ValueError(f"Unknown shard operation {op!r}")
+        except Exception as e:
+            reply = e
+        if not _send(conn, reply):
+            return True
+
+
+def _send(conn, reply):
+    """Send ``reply``; return False if the router has gone away."""
+    try:
+        try:
+            conn.send(reply)
+        except (EOFError, OSError):
+            raise
+        except Exception as e:
+            # Pickling fails before anything is written, so the stream is still in sync
+            conn.send(RuntimeError(f"Shard could not send its reply: {e}"))
+    except (EOFError, OSError):
+        return False
+    return True
+
+
+def validate_top_k(top_k):
+    """Return ``top_k`` as an int, raising ValueError unless it is a positive integer."""
+    if isinstance(top_k, bool) or not isinstance(top_k, (int, np.integer)) or top_k <= 0:
+        raise ValueError(f"topK must be a positive integer, got {top_k!r}")
+    return int(top_k)
+
+
+def _recommend(user_store, course_store, user_ids, top_k):
+    top_k = validate_top_k(top_k)
+    known = [user_id for user_id in user_ids if user_id in user_store]
+    results = {}
+    if known:
+        scores = course_store.batch_scores(user_store.vectors(known))
+        top = top_k_indices(scores, top_k)
+        for row, user_id in enumerate(known):
+            results[user_id] = (course_store.ids[top[row]].tolist(), scores[row, top[row]].tolist())
+    return [results.get(user_id) for user_id in user_ids]
+
+
+class ShardRouter:
+    """Scatter recommendation requests to user shards and gather the results.
+
+    Each shard owns the users whose ``shard_for(user_id)`` matches its index
+    and holds a full replica of the course embeddings, so a request only ever
+    touches the shard that owns the user.
+    """
+
+    def __init__(self, addresses, authkey=None, processes=None):
+        self.addresses = list(addresses)
+        self.num_shards = len(self.addresses)
+        self.authkey = authkey
+        self.connections = [Client(address, authkey=authkey) for address in self.addresses]
+        self.locks = [threading.Lock() for _ in self.addresses]
+        self.processes = processes or []
+
+    @classmethod
+    def launch(cls, user_store, course_store, num_shards, authkey=None):
+        """Start ``num_shards`` local shard processes and connect to them.
+
+        Shards are spawned rather than forked, so each one receives only its
+        pickled slice of ``user_store`` and the course replica instead of the
+        caller's whole address space (including any live TensorFlow runtime).
+        """
+        authkey = authkey or os.urandom(16)
+        ctx = multiprocessing.get_context('spawn')
+
+        shard_ids = [[] for _ in range(num_shards)]
+        for user_id in user_store.ids:
+            shard_ids[shard_for(user_id, num_shards)].append(user_id)
+
+        processes = []
+        addresses = []
+        for ids in shard_ids:
+            receiver, sender = ctx.Pipe(duplex=False)
+            process = ctx.Process(
+                target=serve_shard,
+                args=(user_store.subset(ids), course_store, ('127.0.0.1', 0), authkey, sender),
+                daemon=True,
+            )
+            process.start()
+            sender.close()
+            addresses.append(receiver.recv())
+            receiver.close()
+            processes.append(process)
+
+        return cls(addresses, authkey=authkey, processes=processes)
+
+    def shard_for(self, user_id):
+        return shard_for(user_id, self.num_shards)
+
+    def _connection(self, shard):
+        """Return the shard's connection, reconnecting if an earlier request broke it."""
+        if self.connections[shard] is None:
+            self.connections[shard] = Client(self.addresses[shard], authkey=self.authkey)
+        return self.connections[shard]
+
+    def _discard(self, shard):
+        conn, self.connections[shard] = self.connections[shard], None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _scatter(self, requests):
+        """Send ``{shard: message}`` to every shard before waiting on any reply.
+
+        If any send or receive fails, every connection still owing a reply is
+        closed, so a late reply can never be read as the answer to a later
+        request.
+        """
+        shards = sorted(requests)
+        for shard in shards:
+            self.locks[shard].acquire()
+        try:
+            outstanding = []
+            replies = {}
+            try:
+                for shard in shards:
+                    conn = self._connection(shard)
+                    outstanding.append(shard)
+                    conn.send(requests[shard])
+                for shard in shards:
+                    replies[shard] = self.connections[shard].recv()
+                    outstanding.remove(shard)
+            except BaseException:
+                for shard in outstanding:
+                    self._discard(shard)
+                raise
+        finally:
+            for shard in shards:
+                self.locks[shard].release()
+
+        for reply in replies.values():
+            if isinstance(reply, Exception):
+                raise reply
+        return replies
+
+    def recommend_batch(self, user_ids, top_k=5):
+        """Return ``{user_id: (course_ids, scores)}``, with ``None`` for unknown users."""
+        top_k = validate_top_k(top_k)
+        groups = {}
+        for user_id in user_ids:
+            groups.setdefault(self.shard_for(user_id), []).append(user_id)
+
+        replies = self._scatter({shard: ('recommend', ids, top_k) for shard, ids in groups.items()})
+
+        results = {}
+        for shard, ids in groups.items():
+            results.update(zip(ids, replies[shard]))
+        return results
+
+    def recommend(self, user_id, top_k=5):
+        return self.recommend_batch([user_id], top_k)[user_id]
+
+    def stats(self):
+        replies = self._scatter({shard: ('stats',) for shard in range(self.num_shards)})
+        return [replies[shard] for shard in range(self.num_shards)]
+
+    def close(self):
+        if self.processes:
+            # One shard at a time, so a dead shard does not stop the others shutting down
+            for shard in range(self.num_shards):
+                try:
+                    self._scatter({shard: ('shutdown',)})
+                except (EOFError, OSError):
+                    pass
+        for shard in range(self.num_shards):
+            self._discard(shard)
+        for process in self.processes:
+            process.join(timeout=5)
+        self.processes = []
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check sharded recommendations against a single in-process store")
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--courses', type=int, default=3000)
+    parser.add_argument('--precision', default='float32')
+    parser.add_argument('--top-k', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    user_ids = [f"user_{i}" for i in range(args.users)]
+    course_ids = [str(i) for i in range(args.courses)]
+    user_store = QuantizedEmbeddingStore(user_ids, rng.normal(size=(args.users, 32)), args.precision)
+    course_store = QuantizedEmbeddingStore(course_ids, rng.normal(size=(args.courses, 32)), args.precision)
+
+    router = ShardRouter.launch(user_store, course_store, args.shards)
+    try:
+        for stats in router.stats():
+            print(f"shard pid={stats['pid']} users={stats['users']} user_bytes={stats['user_bytes']}")
+
+        sample = user_ids[::max(1, args.users // 500)] + ["unknown_user"]
+        sharded = router.recommend_batch(sample, args.top_k)
+        mismatches = 0
+        for user_id in sample[:-1]:
+            expected, _ = course_store.top_k(user_store.vector(user_id), args.top_k)
+            if list(expected) != sharded[user_id][0]:
+                mismatches += 1
+        assert sharded["unknown_user"] is None
+        print(f"Checked {len(sample) - 1} users across {args.shards} shards: {mismatches} mismatches")
+        assert mismatches == 0
+    finally:
+        router.close()
@@ -0,0 +1,51 @@
+import pytest
+
+from cooccurrence import CooccurrenceRecommender
+
+
+@pytest.mark.parametrize('metric', ['cosine', 'jaccard'])
+def test_cached_row_follows_neighbour_popularity(metric):
+    engine = CooccurrenceRecommender(metric=metric)
+    engine.add_interaction('a', 'Y')
+    engine.add_interaction('a', 'X')
+    engine.add_interaction('b', 'Y')
+    engine.add_interaction('b', 'Z')
+    engine.add_interaction('c', 'Z')
+    assert engine.similar_courses('Y', 2)[0][0] == 'X'
+
+    # New single-course users only change n(X); Y's row is never dirtied directly
+    for user in range(100):
+        engine.add_interaction(f'new_{user}', 'X')
+
+    similar = dict(engine.similar_courses('Y', 2))
+    assert similar['X'] == pytest.approx(engine.similarity('Y', 'X'))
+    assert engine.similar_courses('Y', 1)[0][0] == 'Z'
+
+
+def test_recommend_for_user_uses_fresh_scores():
+    engine = CooccurrenceRecommender()
+    engine.add_interaction('a', 'Y')
+    engine.add_interaction('a', 'X')
+    engine.add_interaction('b', 'Y')
+    engine.add_interaction('b', 'Z')
+    engine.add_interaction('c', 'Z')
+    engine.add_interaction('u', 'Y')
+    engine.recommend_for_user('u', 2)
+
+    for user in range(100):
+        engine.add_interaction(f'new_{user}', 'X')
+
+    scores = dict(engine.recommend_for_user('u', 2))
+    assert scores['X'] == pytest.approx(engine.similarity('Y', 'X'))
+    assert scores['Z'] == pytest.approx(engine.similarity('Y', 'Z'))
+
+
+def test_rejects_non_positive_top_k():
+    engine = CooccurrenceRecommender()
+    engine.add_interaction('a', 'Y')
+    engine.add_interaction('a', 'X')
+    for top_k in (0, -1):
+        with pytest.raises(ValueError):
+            engine.similar_courses('Y', top_k)
+        with pytest.raises(ValueError):
+            engine.recommend_for_user('a', top_k)
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from ingestion import VIEW_RATING, load_ratings
+
+
+def test_rows_with_missing_fields(tmp_path):
+    log = tmp_path / 'views.csv'
+    log.write_text("user_id,course_id,rating\n"
+                   "u1,c1,4\n"
+                   ",c1,3\n"
+                   "u2,,3\n"
+                   "u2,c2,\n")
+    courses = pd.DataFrame({'course_id': ['c1', 'c2'], 'subject': ['s', 's'], 'level': ['l', 'l']})
+
+    ratings = load_ratings(str(log), courses).sort_values('user_id').reset_index(drop=True)
+
+    assert ratings['user_id'].tolist() == ['u1', 'u2']
+    assert ratings['course_id'].tolist() == ['c1', 'c2']
+    assert ratings['rating'].tolist() == [4.0, VIEW_RATING]
+    assert not np.isnan(ratings['rating']).any()
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from embedding_store import QuantizedEmbeddingStore
+from sharded_store import ShardRouter, shard_for
+
+
+@pytest.fixture(scope='module', params=['float32', 'int8'])
+def sharded(request):
+    rng = np.random.default_rng(0)
+    user_ids = [f"user_{i}" for i in range(300)]
+    user_store = QuantizedEmbeddingStore(user_ids, rng.normal(size=(300, 8)), request.param)
+    course_store = QuantizedEmbeddingStore([str(i) for i in range(50)], rng.normal(size=(50, 8)), request.param)
+    router = ShardRouter.launch(user_store, course_store, 3)
+    try:
+        yield router, user_store, course_store
+    finally:
+        router.close()
+
+
+def test_matches_single_store(sharded):
+    router, user_store, course_store = sharded
+    user_ids = list(user_store.ids)
+    results = router.recommend_batch(user_ids + ["unknown_user"], 5)
+
+    assert results["unknown_user"] is None
+    for user_id in user_ids:
+        expected, _ = course_store.top_k(user_store.vector(user_id), 5)
+        assert results[user_id][0] == list(expected)
+
+
+def test_users_are_partitioned(sharded):
+    router, user_store, _ = sharded
+    counts = [stats['users'] for stats in router.stats()]
+    expected = np.bincount([shard_for(user_id, 3) for user_id in user_store.ids], minlength=3)
+    assert counts == expected.tolist()
+
+
+def test_bad_request_keeps_shards_usable(sharded):
+    router, user_store, course_store = sharded
+    with pytest.raises(ValueError):
+        router.recommend_batch(["user_1"], 0)
+    # Answered by the shard itself rather than rejected by the router
+    with pytest.raises(ValueError):
+        router._scatter({shard: ('bogus',) for shard in range(router.num_shards)})
+    expected, _ = course_store.top_k(user_store.vector("user_1"), 3)
+    assert router.recommend("user_1", 3)[0] == list(expected)